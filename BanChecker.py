@@ -5,20 +5,32 @@ import requests
 import time
 import asyncio
 import random
+import datetime
+import os
+import subprocess
+import sys
 
 from utils.logger import get_logger
-from utils.PriceChecker import get_market_price_from_cache
-from utils.Inventory import get_inventory_summary
-from utils.config import STEAM_API_KEY, BOT_TOKEN, CHANNEL_IDS
+from utils.PriceChecker import get_market_price_from_cache, price_stats
+from utils.Inventory import get_inventory_summary, inventory_stats, mark_inventories_seen, inventory_value_known
+from utils.cache_store import read_json, update_json, HAS_FILE_LOCKS
+from utils.history import HistoryStore, snapshot_from_bans
+from utils.config import STEAM_API_KEY, BOT_TOKEN, CHANNEL_IDS, SHARD_COUNT, SHARD_ID, Update_Interval
+from utils.config import REPORT_MODE, FULL_REPORT_EVERY
 
 logger = get_logger("BanChecker")
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+if SHARD_ID is not None:
+    bot = commands.Bot(command_prefix='!', intents=intents, shard_id=SHARD_ID, shard_count=SHARD_COUNT)
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents)
 
 STEAM_SESSION = requests.Session()
 
+history_store = HistoryStore()
+
 STEAM_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                   "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -29,6 +41,10 @@ STEAM_HEADERS = {
     "Connection": "keep-alive",
 }
 
+VANITY_FILE = "vanity_cache.json"
+# Custom URLs can be released and claimed by another account, so mappings expire
+VANITY_CACHE_TTL = Update_Interval * 24
+
 INVENTORY_MAX_RETRIES = 10
 INVENTORY_BACKOFF_BASE = 1.5
 
@@ -41,6 +57,16 @@ EMBED_FIELD_NAME_LIMIT = 256
 EMBED_TOTAL_CHAR_LIMIT = 6000
 EMBED_MAX_FIELDS = 25
 
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14)
+BULK_DELETE_BATCH_SIZE = 100
+
+# channel id -> ids of messages the bot posted there, so cleanup can skip the history scan
+posted_message_ids = {}
+# channel id -> ids of the last full report, kept across change-only passes
+report_message_ids = {}
+# channel id -> passes since the last full report
+passes_since_full_report = {}
+
 @bot.event
 async def on_ready():
     logger.info("Bot ready. Logged in as %s", bot.user)
@@ -73,6 +99,10 @@ def normalize_steam_profile_link(link):
         if match:
             profile_type, profile_id = match.groups()
             if profile_type == 'id':
+                cached = read_json(VANITY_FILE).get(profile_id)
+                if isinstance(cached, dict) and (time.time() - cached.get("last_updated", 0)) < VANITY_CACHE_TTL:
+                    logger.debug("Resolved vanity URL for %s from cache", profile_id)
+                    return cached["steam_id"], profile_id
                 try:
                     vanity_url = f"http://api.steampowered.com/ISteamUser/ResolveVanityURL/v1/?key={STEAM_API_KEY}&vanityurl={profile_id}"
                     logger.debug("Resolving vanity URL for %s via %s", profile_id, vanity_url)
@@ -80,7 +110,14 @@ def normalize_steam_profile_link(link):
                     response.raise_for_status()
                     data = response.json()
                     if data.get('response', {}).get('success') == 1:
-                        return data['response']['steamid'], profile_id
+                        steam_id = data['response']['steamid']
+                        def remember(cache):
+                            cache[profile_id] = {
+                                "steam_id": steam_id,
+                                "last_updated": int(time.time())
+                            }
+                        update_json(VANITY_FILE, remember)
+                        return steam_id, profile_id
                 except Exception:
                     logger.exception("Failed to resolve vanity URL for %s", profile_id)
             else:
@@ -168,7 +205,8 @@ async def send_embed(channel, title, accounts, total_accounts_found):
     async def send_and_reset(current_embed, printed_so_far):
         try:
             current_embed.add_field(name="Summary", value=f"Total accounts printed (this embed): {printed_so_far}", inline=False)
-            await channel.send(embed=current_embed)
+            sent = await channel.send(embed=current_embed)
+            record_posted_message(sent)
             logger.info("Sent embed '%s' to channel %s (printed=%d, found=%d)", title, channel.id if channel else "unknown", printed_so_far, total_accounts_found)
         except Exception:
             logger.exception("Failed to send embed '%s' to channel %s", title, channel.id if channel else "unknown")
@@ -220,29 +258,94 @@ async def send_totals_embed(channel, group_totals):
 
     embed.add_field(name="Grand Total", value=f"${total_all:.2f}", inline=False)
     try:
-        await channel.send(embed=embed)
+        sent = await channel.send(embed=embed)
+        record_posted_message(sent)
         logger.info("Sent totals embed to channel %s: %s", channel.id if channel else "unknown", {g: f"${t:.2f}" for g, t in group_totals.items()})
     except Exception:
         logger.exception("Failed to send totals embed to channel %s", channel.id if channel else "unknown")
 
+def owns_channel(channel_id):
+    """Whether this process is responsible for the channel in sharded mode."""
+    if SHARD_ID is None:
+        return True
+    # Deterministic slice of CHANNEL_IDS, independent of which guild a channel is in
+    return channel_id % SHARD_COUNT == SHARD_ID
+
+async def resolve_channel(channel_id):
+    """Cached channel, or fetched over REST when its guild is on another gateway shard."""
+    channel = bot.get_channel(channel_id)
+    if channel is not None:
+        return channel
+    try:
+        return await bot.fetch_channel(channel_id)
+    except discord.HTTPException:
+        logger.exception("Failed to fetch channel %s", channel_id)
+        return None
+
 def add_to_group(container, group, value):
     if group not in container:
         container[group] = []
     container[group].append(value)
 
-async def delete_previous_bot_messages(channel):
+def record_posted_message(message):
+    if message is None:
+        return
+    posted_message_ids.setdefault(message.channel.id, []).append(message.id)
+
+async def delete_single_message(channel, message_id):
+    try:
+        await channel.get_partial_message(message_id).delete()
+        return True
+    except discord.NotFound:
+        return False
+
+async def delete_previous_bot_messages(channel, include_report=True):
     deleted = 0
+    message_ids = None
     try:
-        async for message in channel.history(limit=100):
-            if message.author == bot.user:
-                try:
-                    await message.delete()
+        message_ids = posted_message_ids.pop(channel.id, None)
+        if message_ids is not None and include_report:
+            message_ids += report_message_ids.pop(channel.id, [])
+        if message_ids is None:
+            # Nothing recorded yet (e.g. after a restart): fall back to one history scan
+            message_ids = [message.id async for message in channel.history(limit=100) if message.author == bot.user]
+        # Start a fresh record so a pass that posts nothing is remembered as "nothing to delete"
+        posted_message_ids[channel.id] = []
+
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE + datetime.timedelta(minutes=1)
+        recent = [mid for mid in message_ids if discord.utils.snowflake_time(mid) > cutoff]
+        old = [mid for mid in message_ids if discord.utils.snowflake_time(mid) <= cutoff]
+
+        for start in range(0, len(recent), BULK_DELETE_BATCH_SIZE):
+            batch = recent[start:start + BULK_DELETE_BATCH_SIZE]
+            if len(batch) == 1:
+                # bulk delete requires at least two messages
+                old.extend(batch)
+                continue
+            try:
+                await channel.delete_messages([discord.Object(id=mid) for mid in batch])
+                deleted += len(batch)
+            except discord.HTTPException:
+                logger.warning("Bulk delete of %d messages failed in channel %s; deleting individually", len(batch), channel.id)
+                old.extend(batch)
+
+        failed = []
+        if old:
+            results = await asyncio.gather(*(delete_single_message(channel, mid) for mid in old), return_exceptions=True)
+            for mid, result in zip(old, results):
+                if isinstance(result, BaseException):
+                    logger.error("Failed to delete message %s in channel %s: %r", mid, channel.id, result)
+                    failed.append(mid)
+                elif result:
                     deleted += 1
-                except discord.NotFound:
-                    pass
-        logger.info("Deleted %d previous bot messages in channel %s", deleted, channel.id if channel else "unknown")
+
+        # Keep undeleted messages on record so the next pass retries them
+        posted_message_ids[channel.id].extend(failed)
+        logger.info("Deleted %d previous bot messages in channel %s (%d left for retry)", deleted, channel.id if channel else "unknown", len(failed))
     except Exception:
         logger.exception("Failed while deleting previous bot messages in channel %s", channel.id if channel else "unknown")
+        if message_ids is not None:
+            posted_message_ids.setdefault(channel.id, []).extend(message_ids)
              
 def parse_inventory_total(inventory_text):
 
@@ -271,11 +374,21 @@ def parse_inventory_total(inventory_text):
     total = sum(p * c for p, c in totals.values())
     return total
 
+def parse_inventory_item_count(inventory_text):
+    if not inventory_text or not isinstance(inventory_text, str):
+        return 0
+    return sum(int(m.group(1) or 1) for m in re.finditer(r'^.*?(?:\sx(\d+))?\s-\s\S', inventory_text, flags=re.MULTILINE))
+
 @tasks.loop(minutes=60)
 async def check_steam():
     logger.info("check_steam task started")
     for channel_id in CHANNEL_IDS:
-        channel = bot.get_channel(channel_id)
+        if not owns_channel(channel_id):
+            logger.debug("Skipping channel %s owned by another shard", channel_id)
+            continue
+        channel = await resolve_channel(channel_id)
+        if channel is None:
+            continue
         logger.info("Processing channel %s", channel_id)
         vac_banned_accounts = {}
         community_banned_accounts = {}
@@ -283,9 +396,15 @@ async def check_steam():
         not_banned_accounts = {}
         invalid_accounts = {}
         group_totals = {}
+        account_changes = {}
+        seen_steam_ids = set()
         total_accounts_found = 0
 
-        await delete_previous_bot_messages(channel)
+        full_report = (
+            REPORT_MODE == "full"
+            or passes_since_full_report.get(channel_id, FULL_REPORT_EVERY) >= FULL_REPORT_EVERY
+        )
+        await delete_previous_bot_messages(channel, include_report=full_report)
 
         async for message in channel.history(limit=100):
             steam_links = re.findall(r'https?://steamcommunity\.com/(profiles|id)/(\w+)(?:/(\w+))?',message.content)
@@ -307,11 +426,18 @@ async def check_steam():
                       community_banned = profile_status['CommunityBanned']
                       game_ban_count = profile_status['NumberOfGameBans']
                       inventory_info = await asyncio.to_thread(get_inventory_summary, steam_id, 730, 2, True)
+                      seen_steam_ids.add(steam_id)
 
                       inv_total = parse_inventory_total(inventory_info)
                       group_totals[group] = group_totals.get(group, 0.0) + inv_total
                       logger.debug("Added $%.2f to group %s (profile=%s)", inv_total, group, steam_id)
 
+                      snapshot = snapshot_from_bans(steam_id, profile_status, inv_total, parse_inventory_item_count(inventory_info),
+                                                    value_known=inventory_value_known(inventory_info))
+                      change = await asyncio.to_thread(history_store.record, snapshot)
+                      if change is not None:
+                          add_to_group(account_changes, group, f"{full_link} - {change.describe()}")
+
                       profile_info = (
                         f"Original ID: {full_link}\n"
                         f"`Steam ID:` {steam_id}\n"
@@ -338,20 +464,62 @@ async def check_steam():
                     add_to_group(invalid_accounts,group,f"Invalid or unresolvable Steam link: {full_link}")
                     logger.warning("Invalid/unresolvable Steam link: %s", full_link)
 
+        # One cache write per channel instead of one per cache hit
+        await asyncio.to_thread(mark_inventories_seen, seen_steam_ids)
+
         logger.info("Channel %s summary: total_found=%d vac_groups=%d community_groups=%d game_groups=%d not_banned_groups=%d invalid_groups=%d",
                     channel_id, total_accounts_found,
                     len(vac_banned_accounts), len(community_banned_accounts),
                     len(game_banned_accounts), len(not_banned_accounts),
                     len(invalid_accounts))
 
+        if not full_report:
+            # Change-only pass: posting cost scales with the number of changes
+            await send_grouped_embeds(channel, "Changed Since Last Scan", account_changes, total_accounts_found)
+            passes_since_full_report[channel_id] += 1
+            continue
+
         await send_grouped_embeds(channel, "VAC Banned Accounts", vac_banned_accounts, total_accounts_found)
         await send_grouped_embeds(channel, "Community Banned Accounts", community_banned_accounts, total_accounts_found)
         await send_grouped_embeds(channel, "Game Banned Accounts", game_banned_accounts, total_accounts_found)
         await send_grouped_embeds(channel, "Not Banned Accounts", not_banned_accounts, total_accounts_found)
         await send_grouped_embeds(channel, "Invalid Accounts", invalid_accounts, total_accounts_found)
+        await send_grouped_embeds(channel, "Changed Since Last Scan", account_changes, total_accounts_found)
 
         if group_totals:
             await send_totals_embed(channel, group_totals)
 
-logger.info("Entrypoint: starting bot")
+        if REPORT_MODE == "changes":
+            # Keep the full report up until the next full pass; only change embeds are cleaned each pass
+            report_message_ids[channel_id] = posted_message_ids.pop(channel_id, [])
+            posted_message_ids[channel_id] = []
+        passes_since_full_report[channel_id] = 1
+
+    price_stats.flush(logger)
+    inventory_stats.flush(logger)
+
+def run_shard_workers():
+    """Spawn one worker process per shard and wait for them to exit."""
+    workers = []
+    for shard_id in range(SHARD_COUNT):
+        env = dict(os.environ, shard_id=str(shard_id), shard_count=str(SHARD_COUNT))
+        workers.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env))
+        logger.info("Started shard worker %d/%d (pid=%d)", shard_id, SHARD_COUNT, workers[-1].pid)
+    try:
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+    return max((worker.returncode or 0) for worker in workers)
+
+if SHARD_COUNT > 1 and not HAS_FILE_LOCKS:
+    logger.error("shard_count=%d needs file locking (fcntl), which this platform lacks; run with shard_count=1", SHARD_COUNT)
+    raise SystemExit(1)
+
+if SHARD_COUNT > 1 and SHARD_ID is None:
+    logger.info("Entrypoint: starting %d shard workers", SHARD_COUNT)
+    raise SystemExit(run_shard_workers())
+
+logger.info("Entrypoint: starting bot (shard=%s/%d)", SHARD_ID, SHARD_COUNT)
 bot.run(BOT_TOKEN)
\ No newline at end of file
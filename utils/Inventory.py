@@ -1,19 +1,41 @@
+import base64
 import requests
 import time
-import json
 import random
+import zlib
 from typing import Optional
 
-from utils.logger import get_logger
-from utils.PriceChecker import get_market_price_from_cache
-from utils.config import Update_Interval
+from utils.logger import get_logger, PassSummary
+from utils.PriceChecker import get_market_price_from_cache, flush_price_index
+from utils.cache_store import read_json, update_json
+from utils.config import (
+    Update_Interval,
+    INVENTORY_CACHE_MAX_ENTRIES,
+    INVENTORY_CACHE_MAX_BYTES,
+    INVENTORY_CACHE_SEEN_TTL,
+)
 
 # Logger
 logger = get_logger("Inventory")
+inventory_stats = PassSummary("Inventory")
 
 INVENTORY_FILE = "inventory_cache.json"
 INVENTORY_UPDATE_INTERVAL = Update_Interval
 
+# Results of fetch_inventory that are not an item listing
+INVENTORY_UNAVAILABLE = "Inventory unavailable"
+INVENTORY_PRIVATE_OR_RATE_LIMITED = "Inventory private or rate-limited"
+INVENTORY_PRIVATE_OR_UNAVAILABLE = "Inventory private or unavailable"
+INVENTORY_RATE_LIMITED = "Inventory rate-limited"
+INVENTORY_EMPTY = "No items found"
+# Fetch failures: the account's inventory value was not observed
+INVENTORY_FAILURES = frozenset({
+    INVENTORY_UNAVAILABLE,
+    INVENTORY_PRIVATE_OR_RATE_LIMITED,
+    INVENTORY_PRIVATE_OR_UNAVAILABLE,
+    INVENTORY_RATE_LIMITED,
+})
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
     "Accept": "application/json,text/plain,*/*",
@@ -25,33 +47,83 @@ session.headers.update(HEADERS)
 
 
 def read_cache() -> dict:
-    try:
-        with open(INVENTORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    return read_json(INVENTORY_FILE)
+
+
+def compress_inventory(inventory_text: str) -> str:
+    return base64.b64encode(zlib.compress(inventory_text.encode("utf-8"), 9)).decode("ascii")
+
+
+def entry_inventory(entry: Optional[dict]) -> Optional[str]:
+    """Inventory text of a cache entry, compressed ("z") or legacy plain ("inventory")."""
+    if not entry:
+        return None
+    if "z" in entry:
+        try:
+            return zlib.decompress(base64.b64decode(entry["z"])).decode("utf-8")
+        except (ValueError, zlib.error):
+            logger.warning("Corrupt compressed inventory entry; treating as missing")
+            return None
+    return entry.get("inventory")
+
+
+def _entry_size(entry: dict) -> int:
+    return len(entry.get("z") or entry.get("inventory") or "")
 
 
-def write_cache(data: dict) -> None:
-    with open(INVENTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+def evict_entries(cache: dict, now: Optional[int] = None) -> int:
+    """
+    Drop accounts not seen within INVENTORY_CACHE_SEEN_TTL, then the least
+    recently seen ones until the entry and byte limits hold. Returns the
+    number of evicted accounts.
+    """
+    now = int(now if now is not None else time.time())
+    before = len(cache)
+    for steam_id in [k for k, v in cache.items() if now - v.get("last_seen", v.get("last_updated", 0)) >= INVENTORY_CACHE_SEEN_TTL]:
+        del cache[steam_id]
+
+    total_bytes = sum(_entry_size(v) for v in cache.values())
+    if len(cache) > INVENTORY_CACHE_MAX_ENTRIES or total_bytes > INVENTORY_CACHE_MAX_BYTES:
+        by_age = sorted(cache, key=lambda k: cache[k].get("last_seen", cache[k].get("last_updated", 0)))
+        for steam_id in by_age:
+            if len(cache) <= INVENTORY_CACHE_MAX_ENTRIES and total_bytes <= INVENTORY_CACHE_MAX_BYTES:
+                break
+            total_bytes -= _entry_size(cache.pop(steam_id))
+
+    evicted = before - len(cache)
+    if evicted:
+        logger.debug("Evicted %d inventory cache entries", evicted)
+        inventory_stats.count("evicted", evicted)
+    return evicted
 
 
 def update_cache_entry(steam_id: str, inventory_text: str) -> None:
-    cache = read_cache()
-    cache[steam_id] = {
-        "inventory": inventory_text,
-        "last_updated": int(time.time())
-    }
-    write_cache(cache)
+    def apply(cache: dict) -> None:
+        now = int(time.time())
+        cache[steam_id] = {
+            "z": compress_inventory(inventory_text),
+            "last_updated": now,
+            "last_seen": now,
+        }
+        evict_entries(cache, now)
+    update_json(INVENTORY_FILE, apply, indent=None)
+
+
+def mark_inventories_seen(steam_ids) -> None:
+    """Mark the accounts found in a scan pass as seen so LRU eviction keeps them."""
+    steam_ids = set(steam_ids)
+    if not steam_ids:
+        return
+    def apply(cache: dict) -> None:
+        now = int(time.time())
+        for steam_id in steam_ids & cache.keys():
+            cache[steam_id]["last_seen"] = now
+    update_json(INVENTORY_FILE, apply, indent=None)
 
 
 def get_inventory_from_cache(steam_id: str) -> Optional[str]:
     cache = read_cache()
-    entry = cache.get(steam_id)
-    if not entry:
-        return None
-    return entry.get("inventory")
+    return entry_inventory(cache.get(steam_id))
 
 
 def needs_refresh(entry: Optional[dict]) -> bool:
@@ -60,6 +132,11 @@ def needs_refresh(entry: Optional[dict]) -> bool:
     return (time.time() - entry["last_updated"]) >= INVENTORY_UPDATE_INTERVAL
 
 
+def inventory_value_known(inventory_text) -> bool:
+    """Whether an inventory result reflects a successful read (an empty inventory counts)."""
+    return isinstance(inventory_text, str) and inventory_text not in INVENTORY_FAILURES
+
+
 def fetch_inventory(steam_id: str, appid: int = 730, contextid: int = 2) -> str:
     url = f"https://steamcommunity.com/inventory/{steam_id}/{appid}/{contextid}"
     for attempt in range(10):
@@ -84,21 +161,21 @@ def fetch_inventory(steam_id: str, appid: int = 730, contextid: int = 2) -> str:
 
         if not r.text:
             logger.debug("Empty inventory response for %s", steam_id)
-            return "Inventory unavailable"
+            return INVENTORY_UNAVAILABLE
 
         try:
             data = r.json()
         except ValueError:
             logger.warning("Inventory JSON decode failed for %s", steam_id)
-            return "Inventory private or rate-limited"
+            return INVENTORY_PRIVATE_OR_RATE_LIMITED
 
         if not isinstance(data, dict):
             logger.debug("Inventory response not a dict for %s", steam_id)
-            return "Inventory unavailable"
+            return INVENTORY_UNAVAILABLE
 
         if data.get("success") != 1:
             logger.debug("Inventory success flag != 1 for %s", steam_id)
-            return "Inventory private or unavailable"
+            return INVENTORY_PRIVATE_OR_UNAVAILABLE
 
         descriptions = data.get("descriptions")
         assets = data.get("assets") or []
@@ -107,7 +184,7 @@ def fetch_inventory(steam_id: str, appid: int = 730, contextid: int = 2) -> str:
 
         if not isinstance(descriptions, list) or not descriptions:
             logger.debug("No descriptions found in inventory for %s", steam_id)
-            return "No items found"
+            return INVENTORY_EMPTY
 
         asset_counts = {}
         for asset in assets:
@@ -142,6 +219,9 @@ def fetch_inventory(steam_id: str, appid: int = 730, contextid: int = 2) -> str:
                     'marketable': marketable
                 }
 
+        # Publish this inventory's new prices to the shared index in one go
+        flush_price_index()
+
         lines = []
         for v in market_totals.values():
             qty_str = f" x{v['count']}" if v['count'] > 1 else ""
@@ -150,29 +230,30 @@ def fetch_inventory(steam_id: str, appid: int = 730, contextid: int = 2) -> str:
         return "Items:\n" + "\n".join(lines)
 
     logger.error("Exhausted inventory retries for %s after %d attempts", steam_id, 10)
-    return "Inventory rate-limited"
+    return INVENTORY_RATE_LIMITED
 
 
 def get_inventory_summary(steam_id: str, appid: int = 730, contextid: int = 2, use_cache: bool = False) -> str:
     cache = read_cache()
     entry = cache.get(steam_id)
     if use_cache and entry and not needs_refresh(entry):
-        logger.info("Returning cached inventory for %s", steam_id)
-        return entry.get("inventory")
+        inventory = entry_inventory(entry)
+        if inventory is not None:
+            logger.debug("Returning cached inventory for %s", steam_id)
+            inventory_stats.count("cache_hit")
+            return inventory
 
     inventory = fetch_inventory(steam_id, appid=appid, contextid=contextid)
     if inventory and isinstance(inventory, str):
-        logger.info("Returning inventory from Steam for %s", steam_id)
+        logger.debug("Returning inventory from Steam for %s", steam_id)
+        inventory_stats.count("steam_fetch")
         update_cache_entry(steam_id, inventory)
     return inventory
 
 
 def force_update_all_inventories() -> None:
-    cache = read_cache()
+    # Evict stale accounts first so the sweep only refetches recently seen ones
+    cache = update_json(INVENTORY_FILE, evict_entries, indent=None)
     for steam_id in list(cache.keys()):
         inv = fetch_inventory(steam_id)
-        cache[steam_id] = {
-            "inventory": inv,
-            "last_updated": int(time.time())
-        }
-    write_cache(cache)
\ No newline at end of file
+        update_cache_entry(steam_id, inv)
\ No newline at end of file
@@ -1,17 +1,45 @@
 import logging
+import os
 import requests
 import time
-import json
+import re
+import statistics
+import threading
+from typing import Optional
 
-from utils.logger import get_logger
+from utils.logger import get_logger, PassSummary, set_rate_limit
+from utils.cache_store import read_json, update_json, locked
+from utils.price_index import IndexReader, write_index, rows_from_cache
 from utils.config import Update_Interval
 
 # Logger
 logger = get_logger("PriceChecker")
+# Per-item lines stay at DEBUG and are throttled; totals are reported once per pass
+set_rate_limit("PriceChecker", burst=20, interval=60.0, sample_every=100)
+price_stats = PassSummary("PriceChecker")
 
 
 PRICE_FILE = "cs_prices.json"
-UPDATE_INTERVAL = Update_Interval * 6 # 6 times the configured interval
+# Binary, memory-mapped copy of PRICE_FILE used for lookups (see utils/price_index.py)
+PRICE_INDEX_FILE = "cs_prices.idx"
+# Price writes are batched into one index publish per window (and per inventory)
+PRICE_INDEX_PUBLISH_INTERVAL = 30
+
+# Adaptive freshness: cheap items change the reported totals by cents, so they
+# are refreshed rarely; expensive or volatile items are refreshed more often.
+MIN_PRICE_TTL = Update_Interval
+MAX_PRICE_TTL = Update_Interval * 24 * 7
+PRICE_HISTORY_LENGTH = 8
+# (upper bound in dollars, multiple of Update_Interval)
+VALUE_TTL_TIERS = (
+    (1.0, 48),
+    (10.0, 24),
+    (100.0, 12),
+    (1000.0, 6),
+)
+HIGH_VALUE_TTL_MULTIPLIER = 3
+VOLATILITY_WEIGHT = 10.0
+NOT_LISTED_MAX_BACKOFF_STEPS = 6
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
@@ -22,25 +50,109 @@ HEADERS = {
 session = requests.Session()
 session.headers.update(HEADERS)
 
+price_index = IndexReader(PRICE_INDEX_FILE)
+_index_state_lock = threading.Lock()
+_index_dirty = False
+_index_published_at = 0.0
+
 
 def read_cache():
+    return read_json(PRICE_FILE)
+
+def publish_price_index(cache):
+    """Rebuild the mmap price index from the JSON cache; call with PRICE_FILE locked."""
+    # Drop our own mapping first so the replace also works on Windows
+    price_index.release()
+    count = write_index(PRICE_INDEX_FILE, rows_from_cache(cache, parse_price, price_ttl))
+    logger.debug("Published price index with %d entries", count)
+
+def rebuild_price_index():
+    """Best-effort publish of the index from the current JSON cache."""
+    global _index_dirty, _index_published_at
+    with _index_state_lock:
+        _index_dirty = False
+        _index_published_at = time.monotonic()
     try:
-        with open(PRICE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+        with locked(PRICE_FILE):
+            publish_price_index(read_json(PRICE_FILE, lock=False))
+    except OSError:
+        # Lookups keep using the previous index (bounded by expires_at) or the JSON cache
+        logger.warning("Failed to publish price index %s; will retry", PRICE_INDEX_FILE, exc_info=True)
+        with _index_state_lock:
+            _index_dirty = True
 
-def write_cache(data):
-    with open(PRICE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+def flush_price_index(force: bool = True):
+    """Publish pending price writes; with force=False only once the batch window has passed."""
+    with _index_state_lock:
+        if not _index_dirty:
+            return
+        if not force and time.monotonic() - _index_published_at < PRICE_INDEX_PUBLISH_INTERVAL:
+            return
+    rebuild_price_index()
 
-def update_cache_entry(item, price):
-    cache = read_cache()
-    cache[item] = {
+def parse_price(price) -> Optional[float]:
+    """Turn a Steam price string like "$1,234.56" into a float, or None."""
+    if not isinstance(price, str):
+        return None
+    match = re.search(r"[0-9][0-9,]*(?:\.[0-9]+)?", price)
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(",", ""))
+    except ValueError:
+        return None
+
+def is_unlisted(price) -> bool:
+    return isinstance(price, str) and price.lower() in ("n/a", "not listed")
+
+def build_cache_entry(previous, price, now=None):
+    """
+    Build a cache entry for a fresh price, carrying over history and miss count.
+
+    A transient failure ("Request Restricted", "Invalid JSON") keeps the last
+    real price and only schedules a retry, so totals and TTLs are unaffected.
+    """
+    now = int(now if now is not None else time.time())
+    previous = previous or {}
+    history = list(previous.get("history") or [])
+    misses = int(previous.get("misses", 0))
+
+    value = parse_price(price)
+    if value is not None:
+        history.append([now, value])
+        history = history[-PRICE_HISTORY_LENGTH:]
+        misses = 0
+    elif is_unlisted(price):
+        misses += 1
+    elif "last_updated" in previous and (parse_price(previous.get("price")) is not None or is_unlisted(previous.get("price"))):
+        return dict(previous, retry_at=now + MIN_PRICE_TTL)
+    else:
+        # Nothing usable to fall back on: store the failure and retry soon
+        return {
+            "price": price,
+            "last_updated": now,
+            "history": history,
+            "misses": misses,
+            "retry_at": now + MIN_PRICE_TTL,
+        }
+
+    return {
         "price": price,
-        "last_updated": int(time.time())
+        "last_updated": now,
+        "history": history,
+        "misses": misses,
     }
-    write_cache(cache)
+
+def update_cache_entry(item, price):
+    """Store a fetched price and return the price the cache now holds for the item."""
+    global _index_dirty
+    def apply(cache):
+        cache[item] = build_cache_entry(cache.get(item), price)
+    stored = update_json(PRICE_FILE, apply)[item].get("price")
+    with _index_state_lock:
+        _index_dirty = True
+    flush_price_index(force=False)
+    return stored
 
 def steam_price(item):
     """Query Steam priceoverview using requests params so names are URL-encoded."""
@@ -50,12 +162,10 @@ def steam_price(item):
         "appid": 730,
         "market_hash_name": item
     }
-    logger.debug("Priceoverview URL: %s params=%r", url, params)
     while True:
         try:
-            logger.debug("Querying market for item: %s", item)
+            logger.debug("Querying market for item: %s params=%r", item, params)
             r = session.get(url, params=params, timeout=30)
-            logger.debug("Market request URL: %s", r.url)
         except requests.exceptions.RequestException:
             logger.exception("Error fetching market data for %s; retry later", item)
             time.sleep(10)
@@ -74,46 +184,86 @@ def steam_price(item):
             return "Invalid JSON"
 
         if data.get("success") and data.get("lowest_price"):
-            logger.debug("Found price for %s -> %s", item, data.get("lowest_price"))
-            logger.info("Found price for %s -> %s from steam", item, data.get("lowest_price"))
+            logger.debug("Found price for %s -> %s from steam", item, data.get("lowest_price"))
+            price_stats.count("steam_hit")
             return data.get("lowest_price")
 
-        logger.info("Item %s not listed", item)
+        logger.debug("Item %s not listed", item)
+        price_stats.count("not_listed")
         return "Not Listed"
 
 
+def price_volatility(history) -> float:
+    """Coefficient of variation of the recorded prices (0.0 with too little data)."""
+    values = [v for _, v in history or [] if v]
+    if len(values) < 2:
+        return 0.0
+    mean = statistics.fmean(values)
+    if mean <= 0:
+        return 0.0
+    return statistics.pstdev(values) / mean
+
+def price_ttl(entry) -> float:
+    """Seconds a cached entry stays fresh, scaled by item value and volatility."""
+    price = entry.get("price")
+    value = parse_price(price)
+
+    if value is None:
+        if is_unlisted(price):
+            # Back off exponentially on items that keep coming back unlisted
+            steps = min(max(int(entry.get("misses", 1)), 1), NOT_LISTED_MAX_BACKOFF_STEPS)
+            return min(MIN_PRICE_TTL * (2 ** steps), MAX_PRICE_TTL)
+        # Transient failure with no earlier price to keep: retry soon
+        return MIN_PRICE_TTL
+
+    multiplier = HIGH_VALUE_TTL_MULTIPLIER
+    for upper_bound, tier_multiplier in VALUE_TTL_TIERS:
+        if value < upper_bound:
+            multiplier = tier_multiplier
+            break
+
+    ttl = Update_Interval * multiplier
+    ttl /= 1.0 + VOLATILITY_WEIGHT * price_volatility(entry.get("history"))
+    return max(MIN_PRICE_TTL, min(ttl, MAX_PRICE_TTL))
+
 def needs_refresh(entry):
     if not entry or "last_updated" not in entry:
         return True
-    return (time.time() - entry["last_updated"]) >= UPDATE_INTERVAL
+    if "retry_at" in entry:
+        return time.time() >= entry["retry_at"]
+    return (time.time() - entry["last_updated"]) >= price_ttl(entry)
 
 def get_market_price_from_cache(market_hash_name):
+    # Fast path: zero-copy lookup in the shared index, no JSON parsing
+    hit = price_index.lookup(market_hash_name)
+    if hit is not None and time.time() < hit.expires_at:
+        logger.debug("Found price for %s -> %s from index", market_hash_name, hit.price)
+        price_stats.count("cache_hit")
+        return hit.price
+    if hit is None and not os.path.exists(PRICE_INDEX_FILE) and os.path.exists(PRICE_FILE):
+        rebuild_price_index()
+
     cache = read_cache()
     entry = cache.get(market_hash_name)
 
-    # force refresh if 7 days passed
+    # refresh once the adaptive TTL for this item has expired
     if needs_refresh(entry):
         price = steam_price(market_hash_name)
-        update_cache_entry(market_hash_name, price)
-        return price
+        return update_cache_entry(market_hash_name, price)
 
-    # valid cached price
+    # valid cached price (unlisted items are backed off rather than refetched)
     cached_price = entry.get("price")
-    if cached_price and cached_price.lower() not in ("n/a", "not listed"):
-        logger.info("Found price for %s -> %s from cache", market_hash_name, cached_price)
+    if cached_price:
+        logger.debug("Found price for %s -> %s from cache", market_hash_name, cached_price)
+        price_stats.count("cache_hit")
         return cached_price
 
     # fallback fetch
     price = steam_price(market_hash_name)
-    update_cache_entry(market_hash_name, price)
-    return price
+    return update_cache_entry(market_hash_name, price)
 
 def force_update_all_prices():
-    cache = read_cache()
-    for item in cache.keys():
+    # Per-item writes, so other workers' updates are not overwritten
+    for item in list(read_cache().keys()):
         price = steam_price(item)
-        cache[item] = {
-            "price": price,
-            "last_updated": int(time.time())
-        }
-    write_cache(cache)
\ No newline at end of file
+        update_cache_entry(item, price)
\ No newline at end of file
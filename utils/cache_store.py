@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from utils.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+# Whether cache files can safely be shared between processes (sharded mode)
+HAS_FILE_LOCKS = fcntl is not None
+
+# Logger
+logger = get_logger("cache_store")
+
+
+@contextmanager
+def locked(path: str, exclusive: bool = True):
+    """
+    Hold an advisory lock on ``<path>.lock`` for the duration of the block.
+
+    Every process sharing a cache file goes through this lock, so shard
+    workers never interleave a read-modify-write of the same file.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _dump_atomic(path: str, data: dict, indent: Optional[int] = 2) -> None:
+    # Write to a sibling temp file and rename over the target so readers
+    # never observe a half-written cache.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            if indent is None:
+                json.dump(data, f, separators=(",", ":"))
+            else:
+                json.dump(data, f, indent=indent)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_json(path: str, lock: bool = True) -> dict:
+    """Read a JSON cache file, returning {} if it is missing or corrupt."""
+    if not lock:
+        return _load(path)
+    with locked(path, exclusive=False):
+        return _load(path)
+
+
+def write_json(path: str, data: dict, lock: bool = True, indent: Optional[int] = 2) -> None:
+    """
+    Replace a JSON cache file atomically.
+
+    Pass lock=False when the caller already holds ``locked(path)``, and
+    indent=None for compact output.
+    """
+    if not lock:
+        _dump_atomic(path, data, indent)
+        return
+    with locked(path):
+        _dump_atomic(path, data, indent)
+
+
+def update_json(path: str, mutate: Callable[[dict], None], indent: Optional[int] = 2) -> dict:
+    """
+    Locked read-modify-write of a JSON cache file.
+
+    ``mutate`` receives the current contents and edits them in place; the
+    result is written back before the lock is released and returned.
+    """
+    with locked(path):
+        data = _load(path)
+        mutate(data)
+        _dump_atomic(path, data, indent)
+        return data
@@ -1,6 +1,6 @@
 import json
 import os
-from typing import List, Any
+from typing import List, Any, Optional
 
 from utils.logger import get_logger
 
@@ -87,5 +87,46 @@ except:
     logger.warning("No channel IDs configured (CONFIG_FILE=%s). CHANNEL_IDS is empty.", CONFIG_FILE)
     pass
 
+# Sharded mode: SHARD_COUNT worker processes, each owning the CHANNEL_IDS with
+# channel_id % SHARD_COUNT == SHARD_ID. SHARD_ID is set per worker by the launcher.
+SHARD_COUNT: int = 1
+SHARD_ID: Optional[int] = None
+try:
+    SHARD_COUNT = max(int(os.getenv("shard_count", "1")), 1)
+    _shard_id = os.getenv("shard_id")
+    SHARD_ID = int(_shard_id) if _shard_id not in (None, "") else None
+except ValueError:
+    logger.error("Invalid shard_count/shard_id environment values")
+    raise SystemExit(1)
+
+if SHARD_ID is not None and not 0 <= SHARD_ID < SHARD_COUNT:
+    logger.error("shard_id=%d is out of range for shard_count=%d", SHARD_ID, SHARD_COUNT)
+    raise SystemExit(1)
+
+# Inventory cache bounds: accounts not seen in a scan for INVENTORY_CACHE_SEEN_TTL
+# seconds are evicted, then least recently seen entries until under both limits.
+INVENTORY_CACHE_MAX_ENTRIES: int = 5000
+INVENTORY_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+INVENTORY_CACHE_SEEN_TTL: int = Update_Interval * 24 * 14
+try:
+    INVENTORY_CACHE_MAX_ENTRIES = int(os.getenv("inventory_cache_max_entries", INVENTORY_CACHE_MAX_ENTRIES))
+    INVENTORY_CACHE_MAX_BYTES = int(os.getenv("inventory_cache_max_bytes", INVENTORY_CACHE_MAX_BYTES))
+    INVENTORY_CACHE_SEEN_TTL = int(os.getenv("inventory_cache_seen_ttl", INVENTORY_CACHE_SEEN_TTL))
+except ValueError:
+    logger.error("Invalid inventory_cache_* environment values")
+    raise SystemExit(1)
+
+# Reporting: "full" reposts every account each pass; "changes" posts the full
+# report every FULL_REPORT_EVERY passes and only the change feed in between.
+REPORT_MODE: str = os.getenv("report_mode", "changes").strip().lower()
+if REPORT_MODE not in ("full", "changes"):
+    logger.error("Invalid report_mode %r; expected 'full' or 'changes'", REPORT_MODE)
+    raise SystemExit(1)
+try:
+    FULL_REPORT_EVERY: int = max(int(os.getenv("full_report_every", "24")), 1)
+except ValueError:
+    logger.error("Invalid full_report_every environment value")
+    raise SystemExit(1)
+
 
 #logger.info("Configuration loaded: Update_Interval=%d seconds, CHANNEL_IDS=%r", Update_Interval, CHANNEL_IDS)
\ No newline at end of file
@@ -0,0 +1,244 @@
+import bisect
+import struct
+from array import array
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from utils.cache_store import locked
+from utils.logger import get_logger
+
+# Logger
+logger = get_logger("history")
+
+HISTORY_FILE = "account_history.bin"
+
+# Fixed-size, append-only record (little endian):
+#   steam_id(Q) timestamp(I) vac_banned(B) community_banned(B) economy_ban(B) flags(B)
+#   vac_bans(H) game_bans(H) days_since_last_ban(I) inventory_cents(q) item_count(I)
+RECORD = struct.Struct("<QIBBBBHHIqI")
+
+# flags: inventory_cents/item_count were not observed (fetch failed, private, ...)
+FLAG_VALUE_UNKNOWN = 0x01
+
+ECONOMY_BAN_CODES = {"none": 0, "probation": 1, "banned": 2}
+ECONOMY_BAN_NAMES = {v: k for k, v in ECONOMY_BAN_CODES.items()}
+
+# Inventory moves smaller than both thresholds are not reported as changes
+VALUE_CHANGE_MIN_CENTS = 1000
+VALUE_CHANGE_MIN_RATIO = 0.10
+
+# How far out of time order concurrently appended records may be, in seconds
+TIME_ORDER_SLACK = 300
+
+
+class Snapshot(NamedTuple):
+    steam_id: int
+    timestamp: int
+    vac_banned: bool
+    community_banned: bool
+    economy_ban: str
+    vac_bans: int
+    game_bans: int
+    days_since_last_ban: int
+    inventory_cents: int
+    item_count: int
+    value_known: bool = True
+
+    def ban_state(self) -> tuple:
+        return (self.vac_banned, self.community_banned, self.economy_ban, self.vac_bans, self.game_bans)
+
+    def pack(self) -> bytes:
+        return RECORD.pack(
+            self.steam_id, self.timestamp, int(self.vac_banned), int(self.community_banned),
+            ECONOMY_BAN_CODES.get(self.economy_ban, 0), 0 if self.value_known else FLAG_VALUE_UNKNOWN,
+            self.vac_bans, self.game_bans,
+            self.days_since_last_ban, self.inventory_cents, self.item_count,
+        )
+
+    @classmethod
+    def unpack(cls, buf: bytes, offset: int = 0) -> "Snapshot":
+        (steam_id, timestamp, vac, community, economy, flags, vac_bans, game_bans,
+         days, cents, items) = RECORD.unpack_from(buf, offset)
+        return cls(steam_id, timestamp, bool(vac), bool(community), ECONOMY_BAN_NAMES.get(economy, "none"),
+                   vac_bans, game_bans, days, cents, items, not flags & FLAG_VALUE_UNKNOWN)
+
+
+class Change(NamedTuple):
+    previous: Snapshot
+    current: Snapshot
+    ban_changed: bool
+    value_changed: bool
+
+    def describe(self) -> str:
+        cur = self.current
+        prev = self.previous
+        parts = []
+        if self.ban_changed:
+            parts.append(
+                f"bans VAC={prev.vac_bans}->{cur.vac_bans} game={prev.game_bans}->{cur.game_bans} "
+                f"community={prev.community_banned}->{cur.community_banned} economy={prev.economy_ban}->{cur.economy_ban}"
+            )
+        if self.value_changed:
+            parts.append(f"inventory ${prev.inventory_cents / 100:,.2f} -> ${cur.inventory_cents / 100:,.2f}")
+        return f"{cur.steam_id}: " + "; ".join(parts)
+
+
+def snapshot_from_bans(steam_id, player_bans: dict, inventory_total: float, item_count: int,
+                       timestamp: Optional[int] = None, value_known: bool = True) -> Snapshot:
+    """
+    Build a Snapshot from a GetPlayerBans player entry and inventory totals.
+
+    Pass value_known=False when the inventory could not be read, so the
+    zero total is not mistaken for an emptied inventory.
+    """
+    return Snapshot(
+        steam_id=int(steam_id),
+        timestamp=int(timestamp if timestamp is not None else time.time()),
+        vac_banned=bool(player_bans.get("VACBanned")),
+        community_banned=bool(player_bans.get("CommunityBanned")),
+        economy_ban=str(player_bans.get("EconomyBan") or "none").lower(),
+        vac_bans=int(player_bans.get("NumberOfVACBans") or 0),
+        game_bans=int(player_bans.get("NumberOfGameBans") or 0),
+        days_since_last_ban=int(player_bans.get("DaysSinceLastBan") or 0),
+        inventory_cents=int(round(inventory_total * 100)),
+        item_count=int(item_count),
+        value_known=value_known,
+    )
+
+
+def classify_change(previous: Optional[Snapshot], current: Snapshot,
+                    min_cents: int = VALUE_CHANGE_MIN_CENTS,
+                    min_ratio: float = VALUE_CHANGE_MIN_RATIO) -> Optional[Change]:
+    """
+    Return a Change if ban status moved or the value moved past both thresholds.
+
+    First-seen accounts are not changes, and values are only compared when
+    both snapshots actually observed the inventory.
+    """
+    if previous is None:
+        return None
+    ban_changed = previous.ban_state() != current.ban_state()
+    value_changed = False
+    if previous.value_known and current.value_known:
+        delta = abs(current.inventory_cents - previous.inventory_cents)
+        base = max(abs(previous.inventory_cents), 1)
+        value_changed = delta >= min_cents and delta / base >= min_ratio
+    if ban_changed or value_changed:
+        return Change(previous, current, ban_changed, value_changed)
+    return None
+
+
+class HistoryStore:
+    """
+    Append-only time series of per-account snapshots.
+
+    Only the latest snapshot per account and each account's record numbers
+    (a compact array) are kept in memory; everything else is read back from
+    the file. Records are fixed-size and appended in (nearly) time order, so
+    time-range queries binary-search the file directly. Records appended by
+    other processes are picked up by reading only the bytes past the last
+    indexed offset.
+    """
+
+    def __init__(self, path: str = HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._count = 0
+        self._latest: Dict[int, Snapshot] = {}
+        self._rows: Dict[int, array] = {}
+
+    def _catch_up(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._count * RECORD.size)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        for pos in range(0, len(data) - len(data) % RECORD.size, RECORD.size):
+            snap = Snapshot.unpack(data, pos)
+            self._latest[snap.steam_id] = snap
+            self._rows.setdefault(snap.steam_id, array("L")).append(self._count)
+            self._count += 1
+
+    def _read(self, f, row: int) -> Snapshot:
+        f.seek(row * RECORD.size)
+        return Snapshot.unpack(f.read(RECORD.size))
+
+    def _scan(self, f, start: int, end: int) -> Iterator[Tuple[int, Snapshot]]:
+        """(row, snapshot) for records with start <= timestamp < end."""
+        # Appends from several processes can interleave slightly out of
+        # order, so search and stop with some slack around the bounds.
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._read(f, mid).timestamp < start - TIME_ORDER_SLACK:
+                lo = mid + 1
+            else:
+                hi = mid
+        f.seek(lo * RECORD.size)
+        for row in range(lo, self._count):
+            snap = Snapshot.unpack(f.read(RECORD.size))
+            if snap.timestamp >= end + TIME_ORDER_SLACK:
+                break
+            if start <= snap.timestamp < end:
+                yield row, snap
+
+    def latest(self, steam_id) -> Optional[Snapshot]:
+        with self._lock:
+            self._catch_up()
+            return self._latest.get(int(steam_id))
+
+    def account_history(self, steam_id, since: int = 0) -> List[Snapshot]:
+        with self._lock:
+            self._catch_up()
+            rows = self._rows.get(int(steam_id))
+            if not rows:
+                return []
+            with open(self.path, "rb") as f:
+                return [snap for snap in (self._read(f, row) for row in rows) if snap.timestamp >= since]
+
+    def between(self, start: int, end: int) -> List[Snapshot]:
+        """Snapshots with start <= timestamp < end, in file order."""
+        with self._lock:
+            self._catch_up()
+            if not self._count:
+                return []
+            with open(self.path, "rb") as f:
+                return [snap for _, snap in self._scan(f, start, end)]
+
+    def record(self, snapshot: Snapshot, min_cents: int = VALUE_CHANGE_MIN_CENTS,
+               min_ratio: float = VALUE_CHANGE_MIN_RATIO) -> Optional[Change]:
+        """Append a snapshot and return the Change it represents, if any."""
+        with locked(self.path):
+            with self._lock:
+                self._catch_up()
+                previous = self._latest.get(snapshot.steam_id)
+                if not snapshot.value_known and previous is not None:
+                    # Carry the last observed value forward across a failed fetch
+                    snapshot = snapshot._replace(inventory_cents=previous.inventory_cents,
+                                                 item_count=previous.item_count,
+                                                 value_known=previous.value_known)
+                with open(self.path, "ab") as f:
+                    f.write(snapshot.pack())
+                self._catch_up()
+        return classify_change(previous, snapshot, min_cents, min_ratio)
+
+    def changes_between(self, start: int, end: int, min_cents: int = VALUE_CHANGE_MIN_CENTS,
+                        min_ratio: float = VALUE_CHANGE_MIN_RATIO) -> List[Change]:
+        """Change feed: one entry per snapshot in [start, end) that moved past the thresholds."""
+        with self._lock:
+            self._catch_up()
+            if not self._count:
+                return []
+            changes = []
+            with open(self.path, "rb") as f:
+                for row, snap in list(self._scan(f, start, end)):
+                    rows = self._rows[snap.steam_id]
+                    pos = bisect.bisect_left(rows, row)
+                    previous = self._read(f, rows[pos - 1]) if pos else None
+                    change = classify_change(previous, snap, min_cents, min_ratio)
+                    if change is not None:
+                        changes.append(change)
+            changes.sort(key=lambda c: c.current.timestamp)
+            return changes
@@ -1,23 +1,82 @@
+import atexit
 import logging
+import logging.handlers
 import os
-from typing import Optional
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+_TRUTHY = ("1", "true", "True", "yes", "on")
 
 # Internal flag for debug state
-_DEBUG_ENABLED = os.environ.get("LOG_DEBUG", "0") in ("1", "true", "True", "yes", "on")
+_DEBUG_ENABLED = os.environ.get("LOG_DEBUG", "0") in _TRUTHY
+# Queue-based logging: callers only enqueue, a background listener formats and writes
+_ASYNC_ENABLED = os.environ.get("LOG_ASYNC", "0") in _TRUTHY
 
+_listener: Optional[logging.handlers.QueueListener] = None
 
-def configure_logging(level: int = logging.INFO) -> None:
-    """Configure root logging once for the application."""
-    handler = logging.StreamHandler()
-    handler.setLevel(level)
-    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
-    handler.setFormatter(formatter)
 
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() formats the message in the calling thread so the
+    record can be pickled; our queue never leaves the process, so the
+    record is passed through untouched.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _output_handlers() -> list:
+    """Handlers that actually write output (behind the listener in async mode)."""
+    if _listener is not None:
+        return list(_listener.handlers)
+    return list(logging.getLogger().handlers)
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(level: int = logging.INFO, async_mode: Optional[bool] = None) -> None:
+    """
+    Configure root logging once for the application.
+
+    With async_mode (default: LOG_ASYNC env var) the root logger only gets a
+    queue handler and a background listener does formatting and I/O.
+    """
+    global _listener
+    if async_mode is None:
+        async_mode = _ASYNC_ENABLED
+
+    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
     root = logging.getLogger()
-    if not root.handlers:
+
+    if async_mode and _listener is None:
+        handler = logging.StreamHandler()
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(_DeferredQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+    elif not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
         root.addHandler(handler)
     else:
-        for h in root.handlers:
+        for h in _output_handlers():
             h.setLevel(level)
             h.setFormatter(formatter)
 
@@ -29,7 +88,7 @@ def _apply_debug_state(enabled: bool) -> None:
     root = logging.getLogger()
     level = logging.DEBUG if enabled else logging.INFO
     root.setLevel(level)
-    for h in root.handlers:
+    for h in _output_handlers():
         h.setLevel(level)
 
 
@@ -62,4 +121,77 @@ def get_logger(name: Optional[str] = None, level: Optional[int] = None) -> loggi
     logger = logging.getLogger(name)
     if level is not None:
         logger.setLevel(level)
-    return logger
\ No newline at end of file
+    return logger
+
+class RateLimitFilter(logging.Filter):
+    """
+    Throttle high-volume log lines per (logger, message template).
+
+    Each template may emit at most ``burst`` records per ``interval``
+    seconds; beyond that only one in ``sample_every`` records is kept.
+    WARNING and above always pass.
+    """
+
+    def __init__(self, burst: int = 10, interval: float = 60.0, sample_every: int = 0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.sample_every = sample_every
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                window = [now, 0]
+                self._windows[key] = window
+            window[1] += 1
+            seen = window[1]
+        if seen <= self.burst:
+            return True
+        return bool(self.sample_every) and (seen - self.burst) % self.sample_every == 0
+
+
+def set_rate_limit(name: str, burst: int = 10, interval: float = 60.0, sample_every: int = 0) -> RateLimitFilter:
+    """Install (or replace) a RateLimitFilter on the named logger."""
+    target = logging.getLogger(name)
+    for existing in [f for f in target.filters if isinstance(f, RateLimitFilter)]:
+        target.removeFilter(existing)
+    limiter = RateLimitFilter(burst=burst, interval=interval, sample_every=sample_every)
+    target.addFilter(limiter)
+    return limiter
+
+
+class PassSummary:
+    """
+    Thread-safe event counter for one scan pass.
+
+    Hot paths call count() instead of logging per item; flush() then emits a
+    single structured INFO line and resets the counters.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+
+    def count(self, event: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[event] += n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def flush(self, logger: logging.Logger) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._counts)
+            self._counts.clear()
+        if counts:
+            logger.info("%s pass summary: %s", self.name, " ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+        return counts
@@ -0,0 +1,202 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Callable, NamedTuple, Optional
+
+from utils.logger import get_logger
+
+# Logger
+logger = get_logger("price_index")
+
+# File layout (little endian):
+#   header:  magic(4s) version(I) count(I) reserved(I)
+#   records: count x (key(Q) cents(q) last_updated(I) expires_at(I) name_offset(I) name_length(I))
+#            sorted by key, where key is an 8 byte blake2b of the market_hash_name
+#   names:   UTF-8 market_hash_names, referenced by offset from the start of the file
+MAGIC = b"CSPI"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")
+RECORD = struct.Struct("<QqIIII")
+KEY = struct.Struct("<Q")
+
+NOT_LISTED_CENTS = -1
+
+
+class IndexEntry(NamedTuple):
+    cents: int
+    last_updated: int
+    expires_at: int
+
+    @property
+    def price(self) -> str:
+        """Price string in the same form Steam's priceoverview returns."""
+        if self.cents == NOT_LISTED_CENTS:
+            return "Not Listed"
+        return f"${self.cents / 100:,.2f}"
+
+
+def index_key(name: str) -> int:
+    """Stable 64-bit key for a market_hash_name (same value in every process)."""
+    return KEY.unpack(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest())[0]
+
+
+def write_index(path: str, rows) -> int:
+    """
+    Publish a new index built from (name, cents, last_updated, expires_at) rows.
+
+    The file is written next to ``path`` and renamed over it, so readers
+    either keep their old mapping or pick up the complete new one.
+    """
+    entries = sorted(
+        ((index_key(name), name.encode("utf-8"), cents, last_updated, expires_at)
+         for name, cents, last_updated, expires_at in rows),
+        key=lambda e: e[0],
+    )
+
+    names_start = HEADER.size + RECORD.size * len(entries)
+    records = bytearray()
+    names = bytearray()
+    for key, encoded, cents, last_updated, expires_at in entries:
+        records += RECORD.pack(key, int(cents), int(last_updated), int(expires_at),
+                               names_start + len(names), len(encoded))
+        names += encoded
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(entries), 0))
+            f.write(records)
+            f.write(names)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(entries)
+
+
+class PriceIndex:
+    """Read-only, memory-mapped view of one published index file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} price index")
+
+    def is_current(self) -> bool:
+        """Whether the file on disk is still the version this view mapped."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (st.st_ino, st.st_mtime_ns, st.st_size) == (self.stat.st_ino, self.stat.st_mtime_ns, self.stat.st_size)
+
+    def lookup(self, name: str) -> Optional[IndexEntry]:
+        key = index_key(name)
+        encoded = name.encode("utf-8")
+        buf = self._map
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(buf, HEADER.size + mid * RECORD.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        # Walk the (almost always single) run of records sharing this key
+        while lo < self.count:
+            rec_key, cents, last_updated, expires_at, name_offset, name_length = RECORD.unpack_from(
+                buf, HEADER.size + lo * RECORD.size)
+            if rec_key != key:
+                break
+            if buf[name_offset:name_offset + name_length] == encoded:
+                return IndexEntry(cents, last_updated, expires_at)
+            lo += 1
+        return None
+
+    def close(self) -> None:
+        self._map.close()
+
+
+class IndexReader:
+    """
+    Thread-safe lookup front end that remaps the index when a new version
+    has been published.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Optional[PriceIndex] = None
+
+    def _current(self) -> Optional[PriceIndex]:
+        index = self._index
+        if index is not None and index.is_current():
+            return index
+        with self._lock:
+            if self._index is not None and self._index.is_current():
+                return self._index
+            # The old mapping is left for the garbage collector: other threads
+            # may still be reading from it.
+            try:
+                self._index = PriceIndex(self.path)
+            except FileNotFoundError:
+                self._index = None
+            except (ValueError, OSError):
+                logger.exception("Failed to map price index %s", self.path)
+                self._index = None
+            return self._index
+
+    def lookup(self, name: str) -> Optional[IndexEntry]:
+        index = self._current()
+        if index is None:
+            return None
+        try:
+            return index.lookup(name)
+        except ValueError:
+            # Mapping was closed by release() mid-lookup; caller falls back to JSON
+            return None
+
+    def release(self) -> None:
+        """
+        Unmap the current index so the file can be replaced (Windows refuses
+        to replace a file that is still mapped). The next lookup remaps.
+        """
+        with self._lock:
+            index, self._index = self._index, None
+        if index is not None:
+            try:
+                index.close()
+            except BufferError:
+                # Another thread is mid-read; its mapping is freed by the garbage collector
+                pass
+
+
+def rows_from_cache(cache: dict, parse_price: Callable, ttl_for: Callable):
+    """Yield index rows for the priced and "Not Listed" entries of a JSON price cache."""
+    for name, entry in cache.items():
+        if not isinstance(entry, dict) or "last_updated" not in entry:
+            continue
+        price = entry.get("price")
+        value = parse_price(price)
+        if value is not None:
+            cents = int(round(value * 100))
+        elif isinstance(price, str) and price.lower() in ("n/a", "not listed"):
+            cents = NOT_LISTED_CENTS
+        else:
+            # Transient failures stay out of the index and go through the JSON path
+            continue
+        last_updated = int(entry["last_updated"])
+        # A pending retry after a transient failure decides when the kept price expires
+        expires_at = entry.get("retry_at") or last_updated + int(ttl_for(entry))
+        yield name, cents, last_updated, int(expires_at)